@@ -1,6 +1,7 @@
-from src.azure_review import analyze_diff_with_gpt4o
-from src.fetch_pr_diff import fetch_pr_diff
-from src.policy_search import get_top_policy_snippets
+from src.app import is_trivial_diff
+from src.azure_review import review_pr_diff
+from src.fetch_pr_diff import fetch_pr_bundle
+from src.policy_search import search_policy_snippets
 import os
 from dotenv import load_dotenv
 
@@ -10,12 +11,20 @@ owner = os.getenv("GITHUB_OWNER")
 repo = os.getenv("GITHUB_REPO")
 pr_number = int(os.getenv("GITHUB_PR_NUMBER"))
 
-diff_text = fetch_pr_diff(owner, repo, pr_number)
+bundle = fetch_pr_bundle(f"{owner}/{repo}", pr_number)
+diff_text = bundle["diff_text"]
 
-policy_snippets = get_top_policy_snippets(diff_text, top_k=3)
+print(f"Head commit: {bundle['head_sha']}")
 
-print(policy_snippets)
+if is_trivial_diff(diff_text):
+    # Same guard as the orchestrator: nothing for the model to review
+    print("Only lockfile or whitespace changes; skipping policy search and AI review.")
+    review = []
+else:
+    policy_snippets = search_policy_snippets(diff_text, top_k=3)
 
-review = analyze_diff_with_gpt4o(diff_text, policy_snippets)
+    print(policy_snippets)
+
+    review = review_pr_diff(diff_text, policy_snippets)
 
 print(review)
\ No newline at end of file
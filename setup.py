@@ -0,0 +1,20 @@
+"""
+Optional ahead-of-time build of the diff-parsing hot path with mypyc.
+
+    pip install mypy
+    python setup.py build_ext --inplace
+
+This drops src/app.*.so next to src/app.py; Python imports the compiled
+module in preference to the source, so callers keep using
+`from .app import parse_diff_to_positions`. Delete the .so files to go
+back to the interpreted module. Nothing else needs to be installed this way.
+"""
+
+from setuptools import setup
+from mypyc.build import mypycify
+
+setup(
+    name="prguardian-native",
+    packages=[],
+    ext_modules=mypycify(["src/app.py"]),
+)
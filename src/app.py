@@ -1,63 +1,366 @@
+from __future__ import annotations
 
-def parse_diff_to_positions(diff_text):
+import logging
+import re
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# One alternation tags every line the parser cares about; everything else
+# ("index ...", "\ No newline at end of file", blank lines) is skipped by the
+# regex engine without a Python-level iteration. Consecutive added/context
+# lines and consecutive removed lines are consumed as a single run, so long
+# unchanged regions cost one match instead of one iteration per line.
+_DIFF_LINE_RE = re.compile(
+    r"^(?:"
+    r"(?P<file>diff --git[^\n]*)"
+    r"|(?P<hunk>@@)(?: -\d+(?:,\d+)? \+(?P<start>\d+))?"
+    r"|(?P<kept>(?:[+ ][^\n]*(?:\n|\Z))+)"
+    r"|(?P<removed>(?:-[^\n]*(?:\n|\Z))+)"
+    r")",
+    re.M,
+)
+
+_FILE_SPLIT_RE = re.compile(r"^(?=diff --git )", re.M)
+_HUNK_SPLIT_RE = re.compile(r"^(?=@@)", re.M)
+_LINE_RE = re.compile(r"[^\n]*\n|[^\n]+")
+_HUNK_HEADER_RE = re.compile(r"@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@([^\n]*)\n?")
+# Shortest run of unchanged lines condense_diff replaces with a marker
+_MIN_COLLAPSED_LINES = 3
+
+
+# Files whose changes never need a review (generated dependency locks)
+_LOCKFILE_RE = re.compile(r"(?:^|/)(?:package-lock\.json|yarn\.lock|poetry\.lock|Cargo\.lock|go\.sum)$")
+# An added/removed line with something other than whitespace on it
+_SUBSTANTIVE_CHANGE_RE = re.compile(r"^[+-][^\S\n]*\S", re.M)
+
+
+def _count_lines(run: str) -> int:
+    count = run.count("\n")
+    return count if run.endswith("\n") else count + 1
+
+
+class PositionTable(Mapping[int, int]):
+    """
+    Read-only {line_number: diff_position} mapping for one file of a diff.
+
+    Added and context lines come in runs where consecutive line numbers map
+    to consecutive diff positions, so the table stores one entry per run in
+    three parallel arrays (start line, start position, length) sorted by
+    line. Lookups are a bisect over the start lines; memory and build time
+    scale with the number of runs instead of the number of lines.
+    """
+
+    __slots__ = ("_lines", "_positions", "_lengths")
+
+    def __init__(self, runs: Iterable[tuple[int, int, int]] = ()) -> None:
+        self._lines = array("l")
+        self._positions = array("l")
+        self._lengths = array("l")
+        for line, position, length in runs:
+            self.add_run(line, position, length)
+
+    def add_run(self, line: int, position: int, length: int) -> None:
+        """
+        Map `length` consecutive lines starting at `line` to consecutive
+        positions starting at `position`. Later runs override earlier ones.
+        """
+        if length <= 0:
+            return
+
+        lines, positions, lengths = self._lines, self._positions, self._lengths
+        if lines:
+            end = lines[-1] + lengths[-1]
+            if line < end:
+                # Out-of-order or overlapping run (malformed diff): rebuild
+                entries = dict(self.items())
+                entries.update(zip(range(line, line + length), range(position, position + length)))
+                self._rebuild(entries)
+                return
+            if line == end and position == positions[-1] + lengths[-1]:
+                lengths[-1] += length
+                return
+
+        lines.append(line)
+        positions.append(position)
+        lengths.append(length)
+
+    def _rebuild(self, entries: dict[int, int]) -> None:
+        self._lines = array("l")
+        self._positions = array("l")
+        self._lengths = array("l")
+        for line in sorted(entries):
+            self.add_run(line, entries[line], 1)
+
+    def get(self, line: object, default: Optional[int] = None) -> Optional[int]:  # type: ignore[override]
+        if isinstance(line, float) and line.is_integer():
+            line = int(line)
+        elif not isinstance(line, int):
+            return default
+        lines = self._lines
+        i = bisect_right(lines, line) - 1
+        if i < 0 or line >= lines[i] + self._lengths[i]:
+            return default
+        return self._positions[i] + line - lines[i]
+
+    def __getitem__(self, line: object) -> int:
+        position = self.get(line)
+        if position is None:
+            raise KeyError(line)
+        return position
+
+    def __contains__(self, line: object) -> bool:
+        return self.get(line) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        for line, length in zip(self._lines, self._lengths):
+            yield from range(line, line + length)
+
+    def __len__(self) -> int:
+        return sum(self._lengths)
+
+    def items(self) -> list[tuple[int, int]]:  # type: ignore[override]
+        return [
+            (line + offset, position + offset)
+            for line, position, length in zip(self._lines, self._positions, self._lengths)
+            for offset in range(length)
+        ]
+
+    def __repr__(self) -> str:
+        return f"PositionTable({dict(self.items())!r})"
+
+
+def _iter_line_blocks(chunks: Iterable[str]) -> Iterator[str]:
+    # Re-cut arbitrary text chunks at line boundaries, carrying the partial
+    # last line of each chunk over to the next one.
+    carry = ""
+    for chunk in chunks:
+        cut = chunk.rfind("\n")
+        if cut < 0:
+            carry += chunk
+            continue
+        yield carry + chunk[:cut + 1]
+        carry = chunk[cut + 1:]
+    if carry:
+        yield carry
+
+
+def parse_diff_to_positions(diff_text: Union[str, Iterable[str]]) -> dict[str, PositionTable]:
     """
     Parse a Git diff and map each line number to its position in the diff.
+
+    diff_text may be the whole diff as a string or an iterable of text
+    chunks (e.g. a streamed HTTP response); chunks need not end on a newline.
     
     Returns a dict: {
-        "file_path": {
+        "file_path": PositionTable({
             line_number: diff_position,
             ...
-        }
+        })
     }
     
     Important: diff_position starts counting from 1 right after the @@ header.
     """
-    positions_map = {}
-    current_file = None
+    positions_map: dict[str, PositionTable] = {}
+    current_positions: Optional[PositionTable] = None  # positions_map entry of the current file
     diff_position = 0  # Position counter for current hunk
     start_line = 0  # Current line number in the new file
-    
-    for line in diff_text.split('\n'):
-        # When we hit a new file header (e.g., "diff --git a/file.py b/file.py")
-        if line.startswith('diff --git'):
-            # Extract just the filename (after b/)
-            parts = line.split(' b/')
-            if len(parts) == 2:
-                current_file = parts[1]
-                positions_map[current_file] = {}
-            diff_position = 0  # Reset for new file
-            start_line = 0
-            continue
-        
-        # When we hit a hunk header (e.g., "@@ -5,10 +5,12 @@")
-        if line.startswith('@@'):
-            # Extract the target line number (the +X,Y part)
-            # Format: @@ -old_line,old_count +new_line,new_count @@
-            parts = line.split(' ')
-            if len(parts) >= 3:
-                new_range = parts[2]  # e.g., "+5,12"
-                start_line = int(new_range.split(',')[0][1:])  # Remove '+' and split
+
+    blocks: Iterable[str] = (diff_text,) if isinstance(diff_text, str) else _iter_line_blocks(diff_text)
+
+    for block in blocks:
+        for match in _DIFF_LINE_RE.finditer(block):
+            group = match.lastgroup
+
+            # Run of ADDED or CONTEXT lines: each maps its line number to the next position
+            if group == "kept":
+                if current_positions is None:
+                    continue
+                count = _count_lines(match.group("kept"))
+                current_positions.add_run(start_line, diff_position + 1, count)
+                diff_position += count
+                start_line += count
+                continue
+
+            # Run of deleted lines: they take diff positions but have no new line number
+            if group == "removed":
+                if current_positions is None:
+                    continue
+                diff_position += _count_lines(match.group("removed"))
+                continue
+
+            # When we hit a new file header (e.g., "diff --git a/file.py b/file.py")
+            if group == "file":
+                # Extract just the filename (after b/)
+                parts = match.group("file").split(" b/")
+                if len(parts) == 2:
+                    current_positions = positions_map[parts[1]] = PositionTable()
+                diff_position = 0  # Reset for new file
+                start_line = 0
+                continue
+
+            # Hunk header (e.g., "@@ -5,10 +5,12 @@"): the +X part is the target line number
+            if group == "start":
+                start_line = int(match.group("start"))
             diff_position = 0  # Reset position counter for new hunk
+
+    return positions_map
+
+
+def _condense_hunk(hunk: str, context: int) -> str:
+    header = _HUNK_HEADER_RE.match(hunk)
+    if header is None:
+        return hunk
+
+    lines: list[str] = _LINE_RE.findall(hunk, header.end())
+    changed = [i for i, line in enumerate(lines) if line[:1] in ("+", "-")]
+
+    # Keep every line within `context` lines of a change
+    keep = [False] * len(lines)
+    for i in changed:
+        for j in range(max(0, i - context), min(len(lines), i + context + 1)):
+            keep[j] = True
+    # A marker only pays off for longer stretches; keep 1-2 line gaps inline
+    i = 0
+    while i < len(keep):
+        j = i
+        while j < len(keep) and not keep[j]:
+            j += 1
+        if 0 < j - i < _MIN_COLLAPSED_LINES:
+            keep[i:j] = [True] * (j - i)
+        i = j + 1
+    # "\ No newline at end of file" belongs to the line before it
+    for i, line in enumerate(lines):
+        if line.startswith("\\") and i > 0:
+            keep[i] = keep[i - 1]
+
+    if all(keep):
+        return hunk
+
+    old_line = int(header.group(1))
+    new_line = int(header.group(2))
+    suffix = header.group(3)
+
+    out: list[str] = []
+    segment: list[str] = []
+    segment_start = (old_line, new_line)
+    skipped = 0
+
+    def flush() -> None:
+        nonlocal skipped, suffix
+        if skipped:
+            out.append(f"… {skipped} lines unchanged …\n")
+            skipped = 0
+        if not segment:
+            return
+        old_start, new_start = segment_start
+        old_count = sum(1 for line in segment if line[:1] in (" ", "-"))
+        new_count = sum(1 for line in segment if line[:1] in (" ", "+"))
+        out.append(
+            f"@@ -{old_start if old_count else old_start - 1},{old_count} "
+            f"+{new_start if new_count else new_start - 1},{new_count} @@"
+            f"{suffix}\n"
+        )
+        suffix = ""  # The function context only belongs on the first header
+        out.extend(segment)
+        segment.clear()
+
+    for line, kept in zip(lines, keep):
+        if kept:
+            if not segment:
+                segment_start = (old_line, new_line)
+            segment.append(line)
+        else:
+            if segment:
+                flush()
+            skipped += 1
+
+        kind = line[:1]
+        if kind in (" ", "-"):
+            old_line += 1
+        if kind in (" ", "+"):
+            new_line += 1
+
+    flush()
+
+    return "".join(out)
+
+
+def split_diff_by_file(diff_text: str) -> list[str]:
+    """
+    Split a multi-file diff into one diff per file, each starting with its
+    "diff --git" header. Text before the first header is dropped.
+    """
+    return [
+        file_diff
+        for file_diff in _FILE_SPLIT_RE.split(diff_text)
+        if file_diff.startswith("diff --git ")
+    ]
+
+
+def is_trivial_diff(diff_text: str) -> bool:
+    """
+    True when no file in the diff needs an AI review: every changed file is a
+    lockfile, or has hunks whose added/removed lines are whitespace-only.
+    Files without hunks (binary files, mode changes, renames) still count.
+    """
+    for file_diff in split_diff_by_file(diff_text):
+        header, has_hunks, hunks = file_diff.partition("\n@@")
+        parts = header.split("\n", 1)[0].split(" b/")
+        if len(parts) == 2 and _LOCKFILE_RE.search(parts[1]):
             continue
-        
-        # Skip file headers and empty diffs
-        if current_file is None:
+        if not has_hunks or _SUBSTANTIVE_CHANGE_RE.search(hunks):
+            return False
+    return True
+
+
+def condense_diff(diff_text: str, context: int = 3, max_file_chars: int = 20000) -> str:
+    """
+    Shrink a diff before sending it to the LLM.
+
+    Within each hunk only lines within `context` lines of a change are kept;
+    dropped stretches are replaced by a "… N lines unchanged …" marker and
+    the kept segments get their own hunk headers, so new-file line numbers
+    stay derivable. Each file is capped at `max_file_chars` and marked with
+    "… file truncated …" when cut.
+
+    The result is for the model only; review comments are still positioned
+    against the map parsed from the original diff.
+    """
+    condensed = []
+
+    for file_diff in _FILE_SPLIT_RE.split(diff_text):
+        if not file_diff:
             continue
-        
-        # Count every line in the hunk (including context, additions, deletions)
-        if line and line[0] in ['+', '-', ' ']:
-            diff_position += 1
-            
-            # Track positions only for lines being ADDED or in CONTEXT (not deletions)
-            if line[0] in ['+', ' ']:
-                # Map the actual line number to diff position
-                positions_map[current_file][start_line] = diff_position
-                start_line += 1
-    
-    return positions_map
 
+        hunks = _HUNK_SPLIT_RE.split(file_diff)
+        file_text = hunks[0] + "".join(_condense_hunk(hunk, context) for hunk in hunks[1:])
+
+        if len(file_text) > max_file_chars:
+            cut = file_text.rfind("\n", 0, max_file_chars) + 1
+            file_text = file_text[:cut or max_file_chars] + "… file truncated …\n"
+
+        condensed.append(file_text)
+
+    return "".join(condensed)
+
+
+_EMPTY_POSITIONS = PositionTable()
+
+# Comment prefixes for the severities the model is asked to use
+_SEVERITY_BADGES = {
+    severity: f"**[{severity.upper()}]** "
+    for severity in ("critical", "error", "high", "warning", "medium", "info", "low")
+}
 
-def map_ai_response_to_github_format(ai_response_json, diff_positions_map):
+
+def map_ai_response_to_github_format(
+    ai_response_json: Iterable[dict[str, Any]],
+    diff_positions_map: Mapping[str, PositionTable],
+) -> list[dict[str, Any]]:
     """
     Convert Azure AI response to GitHub Review API format.
     
@@ -73,36 +376,43 @@ def map_ai_response_to_github_format(ai_response_json, diff_positions_map):
         ...
     ]
     """
-    github_comments = []
-    
+    github_comments: list[dict[str, Any]] = []
+    seen: set[tuple[str, str, str, str]] = set()
+    skipped = 0
+
     for issue in ai_response_json:
-        file_path = issue.get("file_path")
+        file_path: Any = issue.get("file_path")
         line_number = issue.get("line_number")
-        severity = issue.get("severity", "info").upper()
+        severity = issue.get("severity", "info")
         comment = issue.get("comment", "")
-        
-        # 1. Find the diff position for this line in this file
-        if file_path not in diff_positions_map:
-            # File not in diff, skip this comment
-            print(f"Warning: File {file_path} not found in diff, skipping comment at line {line_number}")
+
+        # The model often repeats the same finding; post it once.
+        # repr() keeps the key hashable whatever types the model sent.
+        key = (repr(file_path), repr(line_number), repr(severity), repr(comment))
+        if key in seen:
             continue
-        
-        if line_number not in diff_positions_map[file_path]:
-            # This line number isn't in the diff (could be unchanged or deleted)
-            print(f"Warning: Line {line_number} in {file_path} not found in diff changes, skipping")
+        seen.add(key)
+
+        # 1. Find the diff position for this line in this file
+        # (missing when the file or line isn't in the diff, e.g. unchanged or deleted)
+        file_positions = diff_positions_map.get(file_path) if isinstance(file_path, str) else None
+        position = (file_positions or _EMPTY_POSITIONS).get(line_number)
+        if position is None:
+            skipped += 1
             continue
-        
-        # 2. Get the position in the diff
-        position = diff_positions_map[file_path][line_number]
-        
-        # 3. Format the comment body with severity badge
-        github_comment_body = f"**[{severity}]** {comment}"
-        
-        # 4. Create the GitHub API comment object
+
+        # 2. Create the GitHub API comment object with a severity badge
+        # (the model's fields aren't guaranteed to be strings, e.g. "comment": null)
+        badge = _SEVERITY_BADGES.get(severity) if isinstance(severity, str) else None
+        if badge is None:
+            badge = f"**[{str(severity).upper()}]** "
         github_comments.append({
             "path": file_path,
             "position": position,
-            "body": github_comment_body
+            "body": badge + str(comment)
         })
-    
+
+    if skipped:
+        logger.warning("%d of %d unique findings not found in diff changes, skipping", skipped, len(seen))
+
     return github_comments
@@ -1,22 +1,262 @@
-import json
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
+import orjson
 from dotenv import load_dotenv
 from openai import AzureOpenAI
 
+from .app import condense_diff, split_diff_by_file
+from .response_cache import ResponseCache, normalize_diff
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# 2024-10-01-preview is the first version that reports cached prompt tokens.
+MIN_CACHED_TOKENS_API_VERSION = "2024-10-01-preview"
+AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_OPENAI_API_VERSION", MIN_CACHED_TOKENS_API_VERSION)
+
+# Versions are dated (YYYY-MM-DD[-preview]), so the date prefix orders them
+if AZURE_OPENAI_API_VERSION[:10] < MIN_CACHED_TOKENS_API_VERSION[:10]:
+    logger.warning(
+        "AZURE_OPENAI_API_VERSION=%s is older than %s; cached prompt tokens will not be reported.",
+        AZURE_OPENAI_API_VERSION, MIN_CACHED_TOKENS_API_VERSION,
+    )
+
 client = AzureOpenAI(
-    api_version=os.environ["AZURE_OPENAI_API_VERSION"],
+    api_version=AZURE_OPENAI_API_VERSION,
     azure_endpoint=os.environ["AZURE_OPENAI_ENDPOINT"],
     api_key=os.environ["AZURE_OPENAI_API_KEY"],
 )
 
+EMBEDDING_DEPLOYMENT_NAME = os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+
+# Large PRs are reviewed as several requests of whole files, run in parallel.
+# Keep MAX_PARALLEL_REVIEWS within the deployment's tokens-per-minute quota.
+REVIEW_CHUNK_CHARS = int(os.environ.get("REVIEW_CHUNK_CHARS", "24000"))
+MAX_PARALLEL_REVIEWS = int(os.environ.get("MAX_PARALLEL_REVIEWS", "4"))
+
+
+def _embed_diff(text: str) -> list[float]:
+    # Embedding models accept ~8k tokens; the head of the diff is enough to
+    # recognise a near-identical re-push.
+    response = client.embeddings.create(model=EMBEDDING_DEPLOYMENT_NAME, input=text[:24000])
+    return response.data[0].embedding
+
+
+# Exact-match layer is always on; the semantic layer is enabled by configuring
+# an embedding deployment (e.g. text-embedding-3-small).
+response_cache = ResponseCache(
+    ttl_seconds=int(os.environ.get("REVIEW_CACHE_TTL_SECONDS", "3600")),
+    redis_url=os.environ.get("REDIS_URL"),
+    embed=_embed_diff if EMBEDDING_DEPLOYMENT_NAME else None,
+)
+
+# Static review policy sent as the first message of every request.
+#
+# Azure OpenAI caches prompt prefixes of 1,024 tokens or more, so this text is
+# deliberately long and must stay byte-identical between calls. Never
+# interpolate per-PR data (diff, repo name, PR number, timestamps) into it;
+# everything dynamic belongs in the trailing user message.
+REVIEW_SYSTEM_PROMPT = """\
+You are PRGuardian, an AI DevOps and SRE code review agent.
+You review pull request diffs against the engineering policy snippets supplied \
+with each request and report concrete, actionable risks.
+
+## Output contract
+
+Return ONLY a valid JSON object with a "findings" array.
+Each finding must use this exact schema:
+{"findings":[{"file_path":"string","line_number":123,"severity":"critical|high|medium|low","comment":"string"}]}
+- Do not include markdown fences.
+- Do not include explanations outside the JSON.
+- Return {"findings":[]} when there is nothing worth reporting.
+- The diff may be one part of a larger PR; review only the files you are given.
+- Only include findings that can be tied to a specific changed file and line number.
+
+## Locating findings
+
+- "file_path" is the path shown after "b/" in the "diff --git" header, without the "b/" prefix.
+- "line_number" is the line number in the NEW version of the file.
+- Compute it from the hunk header "@@ -old_start,old_count +new_start,new_count @@": \
+the first line after the header is new_start, and every line beginning with "+" or " " \
+advances the counter by one. Lines beginning with "-" do not exist in the new file and \
+do not advance the counter.
+- Prefer pointing at an added ("+") line. Point at a context (" ") line only when the \
+problem is caused by the surrounding unchanged code interacting with the change.
+- Never report a line number that falls outside the hunks shown in the diff.
+
+## Severity rubric
+
+critical:
+  Will cause an outage, data loss, data corruption, or a security breach once deployed.
+  Examples: credentials or private keys committed in source; SQL or shell commands built \
+from untrusted input; authentication or authorization checks removed; destructive \
+migrations without a backup or rollback path; unbounded loops or recursion on request paths.
+
+high:
+  Likely to cause incidents, failed deployments, or policy violations that block release.
+  Examples: exceptions swallowed without logging on critical paths; network calls without \
+timeouts; retries without backoff against shared services; breaking API or schema changes \
+without versioning; missing input validation at a trust boundary; secrets read from files \
+that are not excluded from version control.
+
+medium:
+  Degrades reliability, operability, or maintainability but is unlikely to cause an \
+incident on its own.
+  Examples: print statements instead of structured logging; missing metrics or tracing on \
+new endpoints; broad "except Exception" clauses; hard-coded configuration that should come \
+from the environment; generic exception types that hide the failure cause.
+
+low:
+  Style, clarity, or minor best-practice issues that are worth mentioning.
+  Examples: unclear naming; missing docstrings on public functions; dead code; \
+inconsistent error messages; small duplication that could be factored out.
+
+When in doubt between two levels, choose the lower one and explain the uncertainty in the comment.
+
+## Review focus areas
+
+1. Reliability: error handling, retries, timeouts, idempotency, resource cleanup.
+2. Security: secrets handling, injection, authentication, authorization, dependency risk.
+3. Observability: logging quality, log levels, metrics, tracing, actionable error messages.
+4. Deployment safety: configuration changes, feature flags, migrations, backwards compatibility.
+5. Performance: work on hot paths, N+1 calls, unbounded memory, blocking I/O in async code.
+6. Policy compliance: anything the supplied policy snippets require or forbid.
+
+## Writing comments
+
+- One finding per distinct problem; do not repeat the same finding on several lines.
+- State the problem, why it matters in production, and the concrete fix, in at most three sentences.
+- Quote the relevant policy snippet by its number (for example "Policy Snippet 2") when a \
+finding is driven by policy.
+- Do not comment on formatting that an automated formatter would fix.
+- Do not invent code that is not present in the diff.
+
+## What not to report
+
+- Lines that were only deleted; they cannot receive inline comments.
+- Generated files, lockfiles, vendored dependencies, and build artifacts.
+- Pure whitespace, import ordering, or quote-style changes.
+- Speculative issues that depend on code you cannot see; mention them only if the diff \
+itself makes the risk evident.
+- Praise or general observations without a concrete requested change.
+- Test-only changes, unless the test hides a failure (for example a skipped or \
+always-passing assertion) or leaks real credentials.
+
+## Example
+
+Diff excerpt:
+diff --git a/src/api.py b/src/api.py
+@@ -20,5 +20,7 @@ def get_user(user_id):
+     user = db.get(user_id)
+\x20
+     if not user:
++        print("User not found:", user_id)
++        raise Exception("User missing")
+\x20
+     return user
+
+Expected output:
+{"findings":[{"file_path":"src/api.py","line_number":23,"severity":"medium","comment":"Use the \
+structured logger instead of print so the event reaches log aggregation with the right level."},
+{"file_path":"src/api.py","line_number":24,"severity":"medium","comment":"Raise a specific \
+exception type (for example UserNotFoundError) instead of bare Exception so callers can \
+handle the missing-user case explicitly."}]}
+"""
+
+
+def _chunk_file_diffs(file_diffs: list[str], max_chars: int) -> list[str]:
+    # Greedily pack whole files into chunks of at most max_chars
+    # (a single larger file gets a chunk of its own).
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+
+    for file_diff in file_diffs:
+        if current and size + len(file_diff) > max_chars:
+            chunks.append("".join(current))
+            current = []
+            size = 0
+        current.append(file_diff)
+        size += len(file_diff)
+
+    if current:
+        chunks.append("".join(current))
+
+    return chunks
+
+
+def _review_chunk(diff_text: str, formatted_policies: str, model: str) -> list[dict]:
+    user_content = (
+        f"Top relevant policy snippets:\n\n{formatted_policies}\n\n"
+        f"Here is the PR diff:\n\n{diff_text}"
+    )
+
+    cache_key = ResponseCache.make_key(model, REVIEW_SYSTEM_PROMPT, normalize_diff(user_content))
+    # Semantic hits may only come from reviews with the same model, prompt and policies
+    cache_namespace = ResponseCache.make_key(model, REVIEW_SYSTEM_PROMPT, formatted_policies)
+    content = response_cache.get(cache_key, text=diff_text, namespace=cache_namespace)
+    from_cache = content is not None
+
+    if from_cache:
+        logger.info("Azure review served from response cache.")
+    else:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": REVIEW_SYSTEM_PROMPT,
+                },
+                {
+                    "role": "user",
+                    "content": user_content,
+                },
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=2000,
+            temperature=0.1,
+            top_p=1.0,
+        )
+
+        usage = response.usage
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None) or 0
+            logger.info("Prompt tokens: %s (cached: %s)", usage.prompt_tokens, cached_tokens)
+
+        content = response.choices[0].message.content.strip()
+
+    try:
+        result = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        logger.error("Failed to parse Azure review response as JSON. Raw model response:\n%s", content)
+        return []
+
+    findings = result.get("findings") if isinstance(result, dict) else result
+    if not isinstance(findings, list):
+        logger.warning("Azure review did not return a findings list. Returning empty findings.")
+        return []
+
+    # Only store fresh completions: re-storing a hit would re-embed it, reset
+    # its TTL and copy a semantic match's line numbers under this diff's key.
+    if not from_cache:
+        response_cache.set(cache_key, content, text=diff_text, namespace=cache_namespace)
+    return findings
+
 
 def review_pr_diff(diff_text: str, policy_snippets=None) -> list[dict]:
     """
     Analyze a PR diff and return standardized findings.
 
+    The diff is split by file and packed into chunks of REVIEW_CHUNK_CHARS,
+    which are reviewed in parallel (up to MAX_PARALLEL_REVIEWS at a time).
+    If any chunk fails the whole review raises, so a partial review is never
+    mistaken for a clean one. Lockfile- or whitespace-only diffs are
+    filtered out by the caller (see app.is_trivial_diff) before this point.
+
     Returns:
         list of findings in this format:
         [
@@ -34,44 +274,34 @@ def review_pr_diff(diff_text: str, policy_snippets=None) -> list[dict]:
         [f"Policy Snippet {i + 1}:\n{snippet}" for i, snippet in enumerate(policy_snippets)]
     )
 
-    response = client.chat.completions.create(
-        model=os.environ["MODEL_DEPLOYMENT_NAME"],
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are an AI DevOps and SRE code review agent. "
-                    "Analyze the pull request diff against the provided engineering policy snippets. "
-                    "Return ONLY valid JSON as an array of findings. "
-                    "Each finding must use this exact schema: "
-                    '[{"file_path":"string","line_number":123,"severity":"critical|high|medium|low","comment":"string"}]. '
-                    "Do not include markdown fences. Do not include explanations outside the JSON. "
-                    "Only include findings that can be tied to a specific changed file and line number."
-                ),
-            },
-            {
-                "role": "user",
-                "content": (
-                    f"Here is the PR diff:\n\n{diff_text}\n\n"
-                    f"Top relevant policy snippets:\n\n{formatted_policies}"
-                ),
-            },
-        ],
-        max_tokens=2000,
-        temperature=0.1,
-        top_p=1.0,
-    )
+    # Only changed lines and their immediate context are worth paying tokens for
+    diff_text = condense_diff(diff_text)
 
-    content = response.choices[0].message.content.strip()
+    model = os.environ["MODEL_DEPLOYMENT_NAME"]
+    chunks = _chunk_file_diffs(split_diff_by_file(diff_text), REVIEW_CHUNK_CHARS)
 
-    try:
-        findings = json.loads(content)
-        if isinstance(findings, list):
-            return findings
-        print("Azure review did not return a list. Returning empty findings.")
+    if not chunks:
         return []
-    except json.JSONDecodeError:
-        print("Failed to parse Azure review response as JSON.")
-        print("Raw model response:")
-        print(content)
-        return []
\ No newline at end of file
+    if len(chunks) == 1:
+        return _review_chunk(chunks[0], formatted_policies, model)
+
+    findings = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=min(len(chunks), MAX_PARALLEL_REVIEWS)) as executor:
+        futures = [
+            executor.submit(_review_chunk, chunk, formatted_policies, model)
+            for chunk in chunks
+        ]
+        for i, future in enumerate(futures):
+            try:
+                findings.extend(future.result())
+            except Exception as e:
+                logger.error("Azure review failed for diff chunk %d/%d: %s", i + 1, len(chunks), e)
+                errors.append(e)
+
+    if errors:
+        raise RuntimeError(
+            f"Azure review failed for {len(errors)} of {len(chunks)} diff chunks"
+        ) from errors[0]
+
+    return findings
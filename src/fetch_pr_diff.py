@@ -1,6 +1,105 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
 
-from .github_app_auth import get_github_token
+import orjson
+
+from .app import parse_diff_to_positions
+from .github_app_auth import GITHUB_API, get_github_token, http_session
+
+GRAPHQL_URL = f"{GITHUB_API}/graphql"
+
+DIFF_CHUNK_SIZE = 64 * 1024
+
+# Everything the workflow needs about a PR except the unified diff,
+# which GraphQL does not expose.
+PR_BUNDLE_QUERY = """
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      headRefOid
+    }
+  }
+}
+"""
+
+
+def _iter_pr_diff(repo_full_name: str, pr_number: int, github_token: str):
+    headers = {
+        "Accept": "application/vnd.github.v3.diff",
+        "Authorization": f"token {github_token}",
+    }
+
+    url = f"{GITHUB_API}/repos/{repo_full_name}/pulls/{pr_number}"
+
+    with http_session.get(url, headers=headers, timeout=30, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(
+                f"Failed to fetch PR diff: {response.status_code} {response.text}"
+            )
+
+        # Without a declared charset iter_content would yield bytes
+        response.encoding = response.encoding or "utf-8"
+        yield from response.iter_content(chunk_size=DIFF_CHUNK_SIZE, decode_unicode=True)
+
+
+def _fetch_and_parse_diff(repo_full_name: str, pr_number: int, github_token: str):
+    # Parse while downloading; the text is only joined once for the LLM prompt.
+    chunks = []
+
+    def collect():
+        for chunk in _iter_pr_diff(repo_full_name, pr_number, github_token):
+            chunks.append(chunk)
+            yield chunk
+
+    positions_map = parse_diff_to_positions(collect())
+    return "".join(chunks), positions_map
+
+
+def _query_pr(repo_full_name: str, pr_number: int, github_token: str) -> dict:
+    owner, name = repo_full_name.split("/", 1)
+
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"token {github_token}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "query": PR_BUNDLE_QUERY,
+        "variables": {"owner": owner, "name": name, "number": int(pr_number)},
+    }
+
+    response = http_session.post(GRAPHQL_URL, headers=headers, data=orjson.dumps(payload), timeout=30)
+
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"Failed to query PR metadata: {response.status_code} {response.text}"
+        )
+
+    data = orjson.loads(response.content)
+    if data.get("errors"):
+        raise RuntimeError(f"GitHub GraphQL error: {data['errors']}")
+
+    pull_request = (data.get("data") or {}).get("repository", {}).get("pullRequest")
+    if not pull_request:
+        raise RuntimeError(f"PR #{pr_number} not found in {repo_full_name}")
+
+    return pull_request
+
+
+def iter_pr_diff(repo_full_name: str, pr_number: int):
+    """
+    Stream the raw diff for a pull request.
+
+    Args:
+        repo_full_name: "owner/repo"
+        pr_number: PR number
+
+    Yields:
+        Decoded text chunks of up to DIFF_CHUNK_SIZE characters
+    """
+
+    github_token = get_github_token()
+
+    yield from _iter_pr_diff(repo_full_name, pr_number, github_token)
 
 
 def fetch_pr_diff(repo_full_name: str, pr_number: int) -> str:
@@ -15,20 +114,39 @@ def fetch_pr_diff(repo_full_name: str, pr_number: int) -> str:
         Raw diff text
     """
 
-    github_token = get_github_token()
+    return "".join(iter_pr_diff(repo_full_name, pr_number))
 
-    headers = {
-        "Accept": "application/vnd.github.v3.diff",
-        "Authorization": f"token {github_token}",
-    }
 
-    url = f"https://api.github.com/repos/{repo_full_name}/pulls/{pr_number}"
+def fetch_pr_bundle(repo_full_name: str, pr_number: int) -> dict:
+    """
+    Retrieve everything the review workflow needs for a PR with one token,
+    one GraphQL query and one REST diff request issued in parallel. The diff
+    is streamed and parsed into diff positions as it downloads.
 
-    response = requests.get(url, headers=headers, timeout=30)
+    Args:
+        repo_full_name: "owner/repo"
+        pr_number: PR number
 
-    if response.status_code != 200:
-        raise RuntimeError(
-            f"Failed to fetch PR diff: {response.status_code} {response.text}"
-        )
+    Returns:
+        {
+            "head_sha": "abc123...",   # commit the review is posted against
+            "diff_text": "diff --git ...",
+            "positions_map": {"src/app.py": {line_number: diff_position, ...}, ...},
+        }
+    """
 
-    return response.text
\ No newline at end of file
+    github_token = get_github_token()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        diff_future = executor.submit(_fetch_and_parse_diff, repo_full_name, pr_number, github_token)
+        pull_request = _query_pr(repo_full_name, pr_number, github_token)
+        diff_text, positions_map = diff_future.result()
+
+    # The head SHA (GraphQL) and the diff (REST) are read independently: a push
+    # landing between the two requests leaves a SHA that doesn't match the
+    # diff, and GitHub can reject the review positions with HTTP 422.
+    return {
+        "head_sha": pull_request["headRefOid"],
+        "diff_text": diff_text,
+        "positions_map": positions_map,
+    }
@@ -1,7 +1,40 @@
-from github import Github
+import logging
+from urllib.parse import quote
+
+import orjson
+
+from .app import map_ai_response_to_github_format, parse_diff_to_positions
+from .fetch_pr_diff import iter_pr_diff
+from .github_app_auth import GITHUB_API, get_github_token, http_session
+
+logger = logging.getLogger(__name__)
+
+# Larger reviews are split into several so a single POST stays within GitHub's limits
+MAX_COMMENTS_PER_REVIEW = 50
+
+
+def _rest_headers(github_token):
+    return {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"token {github_token}",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+
+def get_pr_head_sha(repo_full_name, pr_number, github_token):
+    """
+    Return the head commit SHA of a PR with a single REST call.
+    """
+    url = f"{GITHUB_API}/repos/{repo_full_name}/pulls/{pr_number}"
+    response = http_session.get(url, headers=_rest_headers(github_token), timeout=30)
+
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"Failed to fetch PR: {response.status_code} {response.text}"
+        )
+
+    return orjson.loads(response.content)["head"]["sha"]
 
-from .app import map_ai_response_to_github_format
-from .github_app_auth import get_github_token
 
 def build_review_summary(ai_suggestions):
     """
@@ -44,7 +77,8 @@ def build_review_summary(ai_suggestions):
 
     return summary
 
-def post_bulk_review(repo_full_name, pr_number, ai_suggestions, positions_map):
+def post_bulk_review(repo_full_name, pr_number, ai_suggestions, positions_map=None,
+                     head_sha=None, diff_text=None):
     """
     Post a GitHub PR review with AI suggestions as inline comments.
 
@@ -53,43 +87,66 @@ def post_bulk_review(repo_full_name, pr_number, ai_suggestions, positions_map):
         pr_number: PR number
         ai_suggestions: List of dicts from Azure AI
         positions_map: Parsed diff position map from orchestrator
+        head_sha: Head commit of the PR, if already known (avoids listing commits)
+        diff_text: PR diff, used when positions_map isn't given. If neither is
+            given the diff is fetched once (streamed) and parsed here.
     """
     try:
         github_token = get_github_token()
     except Exception as e:
-        print(f"Error getting GitHub token: {e}")
+        logger.error("Error getting GitHub token: %s", e)
         return
 
-    g = Github(github_token)
-    repo = g.get_repo(repo_full_name)
-    pr = repo.get_pull(int(pr_number))
+    if positions_map is None:
+        if diff_text is None:
+            diff_text = iter_pr_diff(repo_full_name, pr_number)
+        positions_map = parse_diff_to_positions(diff_text)
 
+    # Positions come straight from positions_map, so they are valid for this diff
     github_comments = map_ai_response_to_github_format(ai_suggestions, positions_map)
 
-    print("Mapped GitHub comments:", github_comments)
+    logger.debug("Mapped GitHub comments: %s", github_comments)
 
     if not github_comments:
-        print("No valid inline comments to post")
-        return
-
-    commits = list(pr.get_commits())
-    if not commits:
-        print("Error: PR has no commits")
+        logger.info("No valid inline comments to post")
         return
 
-    commit = commits[-1]
+    if not head_sha:
+        head_sha = get_pr_head_sha(repo_full_name, pr_number, github_token)
 
     review_body = build_review_summary(ai_suggestions)
 
-    pr.create_review(
-        commit=commit,
-        body=review_body,
-        event="COMMENT",
-        comments=github_comments,
+    url = f"{GITHUB_API}/repos/{repo_full_name}/pulls/{pr_number}/reviews"
+    headers = {**_rest_headers(github_token), "Content-Type": "application/json"}
+    batches = [
+        github_comments[i:i + MAX_COMMENTS_PER_REVIEW]
+        for i in range(0, len(github_comments), MAX_COMMENTS_PER_REVIEW)
+    ]
+
+    for index, batch in enumerate(batches):
+        # The summary goes on the first review; the rest are continuations
+        body = review_body if index == 0 else (
+            f"## PRGuardian AI Review (continued, part {index + 1}/{len(batches)})"
+        )
+        payload = {
+            "commit_id": head_sha,
+            "body": body,
+            "event": "COMMENT",
+            "comments": batch,
+        }
+
+        response = http_session.post(url, headers=headers, data=orjson.dumps(payload), timeout=30)
+
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"Failed to post review: {response.status_code} {response.text}"
+            )
+
+    logger.info(
+        "Review posted to PR #%s with %d inline comments in %d review(s)",
+        pr_number, len(github_comments), len(batches),
     )
 
-    print(f"Review posted to PR #{pr_number} with {len(github_comments)} inline comments")
-
 
 def update_github_labels(repo_full_name, pr_number, labels_to_add=None, labels_to_remove=None):
     """
@@ -104,30 +161,49 @@ def update_github_labels(repo_full_name, pr_number, labels_to_add=None, labels_t
     try:
         github_token = get_github_token()
     except Exception as e:
-        print(f"Error getting GitHub token: {e}")
+        logger.error("Error getting GitHub token: %s", e)
         return
 
     labels_to_add = labels_to_add or []
     labels_to_remove = labels_to_remove or []
 
-    g = Github(github_token)
-    repo = g.get_repo(repo_full_name)
-    issue = repo.get_issue(int(pr_number))  # PRs are issues for labels
+    headers = _rest_headers(github_token)
+    url = f"{GITHUB_API}/repos/{repo_full_name}/issues/{pr_number}/labels"  # PRs are issues for labels
 
-    existing_labels = [label.name for label in issue.get_labels()]
+    response = http_session.get(url, headers=headers, params={"per_page": 100}, timeout=30)
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"Failed to fetch labels: {response.status_code} {response.text}"
+        )
 
-    for label in labels_to_add:
-        if label not in existing_labels:
-            issue.add_to_labels(label)
-            print(f"Added label: {label}")
+    existing_labels = {label["name"] for label in orjson.loads(response.content)}
+
+    new_labels = [label for label in labels_to_add if label not in existing_labels]
+    if new_labels:
+        response = http_session.post(
+            url,
+            headers={**headers, "Content-Type": "application/json"},
+            data=orjson.dumps({"labels": new_labels}),
+            timeout=30,
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f"Failed to add labels: {response.status_code} {response.text}"
+            )
+        for label in new_labels:
+            logger.info("Added label: %s", label)
 
     for label in labels_to_remove:
         if label in existing_labels:
-            issue.remove_from_labels(label)
-            print(f"Removed label: {label}")
+            response = http_session.delete(f"{url}/{quote(label, safe='')}", headers=headers, timeout=30)
+            if response.status_code >= 400 and response.status_code != 404:
+                raise RuntimeError(
+                    f"Failed to remove label {label}: {response.status_code} {response.text}"
+                )
+            logger.info("Removed label: %s", label)
 
 
-def run_review_and_label(repo_full_name, pr_number, ai_suggestions, positions_map):
+def run_review_and_label(repo_full_name, pr_number, ai_suggestions, positions_map, head_sha=None):
     """
     Run the PR review workflow:
     1. Post inline review comments
@@ -141,7 +217,7 @@ def run_review_and_label(repo_full_name, pr_number, ai_suggestions, positions_ma
     has_blocking_issues = any(sev in {"critical", "high"} for sev in severities)
     has_non_blocking_issues = any(sev in {"medium", "low"} for sev in severities)
 
-    post_bulk_review(repo_full_name, pr_number, ai_suggestions, positions_map)
+    post_bulk_review(repo_full_name, pr_number, ai_suggestions, positions_map, head_sha=head_sha)
 
     if has_blocking_issues:
         update_github_labels(
@@ -1,17 +1,53 @@
 from __future__ import annotations
 
 import os
+import threading
 import time
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 import logging
 import jwt  # PyJWT
+import orjson
 import requests
+from cryptography.hazmat.primitives import serialization
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
 
 
 GITHUB_API = "https://api.github.com"
 
 
+def _build_http_session() -> requests.Session:
+    # Retries cover idempotent requests only (urllib3 skips POST by default);
+    # raise_on_status=False leaves the final response to the caller's checks.
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 502, 503, 504],
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+    return session
+
+
+# Shared keep-alive session for all GitHub API calls. Requests only read its
+# configuration and check connections out of urllib3's thread-safe pool, so
+# worker threads (fetch_pr_bundle, run_pr_audits) share it; pool_maxsize
+# bounds the connections kept open per host.
+http_session = _build_http_session()
+
+# Installation tokens live for an hour; refresh this long before they expire.
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+
+_TOKEN_CACHE: tuple[str, float] | None = None  # (token, expires_at epoch seconds)
+_TOKEN_LOCK = threading.Lock()
+
+
 def _require_env(name: str) -> str:
     v = os.getenv(name)
     if not v:
@@ -19,7 +55,41 @@ def _require_env(name: str) -> str:
     return v
 
 
+@lru_cache(maxsize=1)
+def _load_private_key(private_key_pem: str):
+    # Parsing and validating the PEM is the expensive part of RS256 signing;
+    # PyJWT accepts the loaded key object and skips re-parsing it.
+    return serialization.load_pem_private_key(private_key_pem.encode(), password=None)
+
+
+def _parse_expires_at(value: str | None, now: float) -> float:
+    # GitHub returns e.g. "2016-07-11T22:14:10Z"; assume ~55 minutes if absent.
+    if not value:
+        return now + 3300
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return now + 3300
+
+
 def get_installation_access_token() -> str:
+    """
+    Return a GitHub App installation access token.
+
+    Tokens are cached in-process until shortly before they expire, so the
+    JWT signing and token exchange only happen about once an hour.
+    """
+    global _TOKEN_CACHE
+
+    with _TOKEN_LOCK:
+        if _TOKEN_CACHE and time.time() < _TOKEN_CACHE[1] - TOKEN_REFRESH_MARGIN_SECONDS:
+            return _TOKEN_CACHE[0]
+
+        _TOKEN_CACHE = _create_installation_access_token()
+        return _TOKEN_CACHE[0]
+
+
+def _create_installation_access_token() -> tuple[str, float]:
     """
     GitHub App auth flow:
     1) Sign a short-lived JWT with your App's private key (from Env Var)
@@ -53,9 +123,9 @@ def get_installation_access_token() -> str:
     }
 
     try:
-        app_jwt = jwt.encode(payload, private_key_pem, algorithm="RS256")
+        app_jwt = jwt.encode(payload, _load_private_key(private_key_pem), algorithm="RS256")
     except Exception as e:
-        logging.error(f"Failed to encode JWT. Check if private key format is valid: {e}")
+        logger.error("Failed to encode JWT. Check if private key format is valid: %s", e)
         raise
 
     # 4. Exchange JWT for an Installation Access Token
@@ -66,20 +136,20 @@ def get_installation_access_token() -> str:
         "X-GitHub-Api-Version": "2022-11-28",
     }
 
-    resp = requests.post(url, headers=headers, timeout=60)
+    resp = http_session.post(url, headers=headers, timeout=60)
     
     if resp.status_code >= 400:
-        logging.error(f"GitHub Auth Error: {resp.status_code} - {resp.text}")
+        logger.error("GitHub Auth Error: %s - %s", resp.status_code, resp.text)
         raise RuntimeError(f"Failed to create installation token: {resp.status_code}")
 
-    # 5. Extract and return the token
-    data = resp.json()
+    # 5. Extract and return the token with its expiry
+    data = orjson.loads(resp.content)
     token = data.get("token")
 
     if not token:
         raise RuntimeError(f"No token returned from GitHub. Response: {data}")
 
-    return token
+    return token, _parse_expires_at(data.get("expires_at"), time.time())
 
 def get_github_token() -> str:
     """
@@ -1,9 +1,17 @@
+import asyncio
+import logging
+
 from .orchestrator import run_pr_guardian_workflow
 
 """
 INTEGRATION: Entry point for running the PRGuardian audit workflow.
 """
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on PR audits in flight at once (GitHub + Azure rate limits).
+MAX_CONCURRENT_AUDITS = 5
+
 
 def run_pr_audit(repo_full_name, pr_number):
     """
@@ -14,9 +22,7 @@ def run_pr_audit(repo_full_name, pr_number):
         pr_number: PR number
     """
 
-    print(f"\n{'='*70}")
-    print(f"PRGuardian Audit: {repo_full_name} PR #{pr_number}")
-    print(f"{'='*70}\n")
+    logger.info("PRGuardian Audit: %s PR #%s", repo_full_name, pr_number)
 
     try:
         result = run_pr_guardian_workflow(
@@ -24,9 +30,42 @@ def run_pr_audit(repo_full_name, pr_number):
             pr_number=pr_number,
         )
 
-        print("\nAudit complete!\n")
+        logger.info("Audit complete: %s PR #%s", repo_full_name, pr_number)
         return result
 
     except Exception as e:
-        print(f"\nAudit failed: {e}\n")
-        return False
\ No newline at end of file
+        logger.error("Audit failed: %s PR #%s: %s", repo_full_name, pr_number, e)
+        return False
+
+
+async def audit_pr(semaphore, repo_full_name, pr_number):
+    """
+    Run one PR audit in a worker thread once a concurrency slot is free.
+    """
+    async with semaphore:
+        return await asyncio.to_thread(run_pr_audit, repo_full_name, pr_number)
+
+
+async def _run_pr_audits(repo_full_name, pr_numbers, max_concurrency):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(
+        *(audit_pr(semaphore, repo_full_name, pr_number) for pr_number in pr_numbers)
+    )
+
+
+def run_pr_audits(repo_full_name, pr_numbers, max_concurrency=MAX_CONCURRENT_AUDITS):
+    """
+    Audit several PRs of a repository concurrently (e.g. a nightly sweep).
+
+    The workflow is network-bound, so overlapping audits makes the batch
+    take roughly as long as the slowest PR instead of the sum of all of them.
+
+    Args:
+        repo_full_name: "owner/repo"
+        pr_numbers: iterable of PR numbers
+        max_concurrency: maximum number of audits running at the same time
+
+    Returns:
+        list of per-PR results, in the same order as pr_numbers
+    """
+    return asyncio.run(_run_pr_audits(repo_full_name, list(pr_numbers), max_concurrency))
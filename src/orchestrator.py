@@ -1,40 +1,51 @@
-from .app import parse_diff_to_positions
+import logging
+
+from .app import is_trivial_diff
 from .azure_review import review_pr_diff
-from .fetch_pr_diff import fetch_pr_diff
+from .fetch_pr_diff import fetch_pr_bundle
 from .github_actions import run_review_and_label
 from .policy_search import search_policy_snippets
 
+logger = logging.getLogger(__name__)
+
 
 def run_pr_guardian_workflow(repo_full_name, pr_number):
     """
     Core PRGuardian workflow orchestrator.
 
     Flow:
-    - fetch PR diff
+    - fetch PR diff and head commit
     - parse diff positions
     - retrieve relevant policy snippets
     - run AI review
     - send findings + positions to GitHub action layer
     """
 
-    diff_text = fetch_pr_diff(repo_full_name, pr_number)
-    positions_map = parse_diff_to_positions(diff_text)
+    bundle = fetch_pr_bundle(repo_full_name, pr_number)
+    diff_text = bundle["diff_text"]
+    positions_map = bundle["positions_map"]
 
-    print("\nFetched PR diff successfully.")
-    print(f"Diff length: {len(diff_text)} characters")
-    print(f"Parsed positions for files: {list(positions_map.keys())}")
+    logger.info("Fetched PR diff successfully.")
+    logger.info("Diff length: %d characters", len(diff_text))
+    logger.info("Parsed positions for files: %s", list(positions_map.keys()))
 
-    policy_snippets = search_policy_snippets(diff_text)
-    print(f"Policy snippets retrieved: {len(policy_snippets)}")
+    if is_trivial_diff(diff_text):
+        # Nothing to review; skip both the search and the model call
+        logger.info("Only lockfile or whitespace changes; skipping policy search and AI review.")
+        findings = []
+    else:
+        policy_snippets = search_policy_snippets(diff_text)
+        logger.info("Policy snippets retrieved: %d", len(policy_snippets))
 
-    findings = review_pr_diff(diff_text, policy_snippets=policy_snippets)
-    print(f"AI findings returned: {len(findings)}")
+        findings = review_pr_diff(diff_text, policy_snippets=policy_snippets)
+        logger.info("AI findings returned: %d", len(findings))
 
     run_review_and_label(
         repo_full_name=repo_full_name,
         pr_number=pr_number,
         ai_suggestions=findings,
         positions_map=positions_map,
+        head_sha=bundle["head_sha"],
     )
 
     return True
\ No newline at end of file
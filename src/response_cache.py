@@ -0,0 +1,184 @@
+"""
+Response cache for Azure OpenAI review calls.
+
+Two layers:
+- exact: SHA-256 of (deployment, system prompt, normalized prompt) -> completion.
+  Stored in Redis when a URL is configured, otherwise in process memory.
+- semantic (optional): embedding of the diff compared against recently cached
+  diffs in the same namespace (model, system prompt, policies); a hit above
+  the score threshold reuses that diff's completion.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "prguardian:review:"
+
+# "index 7a8b9c1..3b4c5d6 100644" changes on every rebase without changing the code.
+_INDEX_LINE_RE = re.compile(r"^index [0-9a-f]+\.\.[0-9a-f]+(?: \d+)?\n?", re.M)
+# Some diff producers append a timestamp to the ---/+++ file headers.
+_HEADER_TIMESTAMP_RE = re.compile(r"^((?:---|\+\+\+) [^\t\n]+)\t[^\n]*", re.M)
+
+
+def normalize_diff(diff_text: str) -> str:
+    """
+    Strip cosmetic parts of a diff (blob SHAs, header timestamps, CRLF)
+    so that rebased or force-pushed PRs with identical changes hash the same.
+    """
+    text = diff_text.replace("\r\n", "\n")
+    text = _INDEX_LINE_RE.sub("", text)
+    return _HEADER_TIMESTAMP_RE.sub(r"\1", text)
+
+
+def _cosine_similarity(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """
+    Cache of model completions keyed by prompt content.
+
+    Args:
+        ttl_seconds: how long a cached completion stays valid
+        redis_url: optional Redis URL for the exact layer (shared across workers)
+        embed: optional callable text -> list[float]; enables the semantic layer
+        score_threshold: minimum cosine similarity for a semantic hit
+        max_entries: bound on in-process entries (exact layer and vectors)
+    """
+
+    def __init__(self, ttl_seconds=3600, redis_url=None, embed=None,
+                 score_threshold=0.95, max_entries=256):
+        self.ttl_seconds = ttl_seconds
+        self.embed = embed
+        self.score_threshold = score_threshold
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, completion)
+        self._vectors = OrderedDict()  # key -> (expires_at, namespace, embedding)
+        self._pending = OrderedDict()  # key -> embedding computed by a missed get()
+
+        self._redis = None
+        if redis_url:
+            try:
+                import redis  # Optional dependency, only needed for a shared cache
+            except ImportError:
+                logger.warning("REDIS_URL is set but the redis package is not installed; "
+                               "using the in-process cache.")
+            else:
+                self._redis = redis.Redis.from_url(redis_url)
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str, text: str = None, namespace: str = ""):
+        """
+        Return the cached completion for `key`, falling back to a semantic
+        lookup on `text` when an embedder is configured. None on miss.
+
+        The semantic lookup only considers entries stored with the same
+        `namespace`, so a completion made for another model, prompt or set
+        of policies is never reused.
+        """
+        completion = self._get_exact(key)
+        if completion is not None or self.embed is None or text is None:
+            return completion
+
+        try:
+            vector = self.embed(text)
+        except Exception as e:
+            logger.warning("Embedding failed, skipping semantic lookup: %s", e)
+            return None
+
+        now = time.time()
+        best_key, best_score = None, 0.0
+        with self._lock:
+            candidates = list(self._vectors.items())
+        for candidate_key, (expires_at, candidate_namespace, candidate) in candidates:
+            if expires_at <= now or candidate_namespace != namespace:
+                continue
+            score = _cosine_similarity(vector, candidate)
+            if score > best_score:
+                best_key, best_score = candidate_key, score
+
+        if best_key is None or best_score < self.score_threshold:
+            # Keep the vector so the following set() does not embed the text again
+            with self._lock:
+                self._pending[key] = vector
+                while len(self._pending) > self.max_entries:
+                    self._pending.popitem(last=False)
+            return None
+
+        logger.info("Semantic cache hit (score %.3f)", best_score)
+        return self._get_exact(best_key)
+
+    def set(self, key: str, completion: str, text: str = None, namespace: str = ""):
+        """
+        Store a completion under `key` and, when an embedder is configured,
+        remember the embedding of `text` for semantic lookups in `namespace`.
+        """
+        expires_at = time.time() + self.ttl_seconds
+
+        if self._redis is not None:
+            try:
+                self._redis.set(KEY_PREFIX + key, completion, ex=self.ttl_seconds)
+            except Exception as e:
+                logger.warning("Redis write failed: %s", e)
+        else:
+            with self._lock:
+                self._entries[key] = (expires_at, completion)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        if self.embed is None or text is None:
+            return
+
+        with self._lock:
+            vector = self._pending.pop(key, None)
+        if vector is None:
+            try:
+                vector = self.embed(text)
+            except Exception as e:
+                logger.warning("Embedding failed, not indexing entry: %s", e)
+                return
+
+        with self._lock:
+            self._vectors[key] = (expires_at, namespace, vector)
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+    def _get_exact(self, key: str):
+        if self._redis is not None:
+            try:
+                value = self._redis.get(KEY_PREFIX + key)
+            except Exception as e:
+                logger.warning("Redis read failed: %s", e)
+                return None
+            return value.decode("utf-8") if value is not None else None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, completion = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return completion
@@ -0,0 +1,26 @@
+import importlib
+
+import pytest
+
+# These are manual scripts that call live GitHub/Azure services on import;
+# run them directly (python -m tests.test_workflow), not under pytest.
+collect_ignore = ["test_pipeline_local.py", "test_run.py", "test_workflow.py"]
+
+
+@pytest.fixture
+def azure_review(monkeypatch):
+    # The module builds its Azure OpenAI client at import time; no request is sent.
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setenv("MODEL_DEPLOYMENT_NAME", "test-deployment")
+    monkeypatch.delenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", raising=False)
+    return importlib.import_module("src.azure_review")
+
+
+@pytest.fixture
+def integration(azure_review, monkeypatch):
+    # policy_search also builds its client at import time
+    monkeypatch.setenv("AZURE_SEARCH_ENDPOINT", "https://example.search.windows.net")
+    monkeypatch.setenv("AZURE_SEARCH_INDEX_NAME", "policies")
+    monkeypatch.setenv("AZURE_SEARCH_API_KEY", "test")
+    return importlib.import_module("src.integration")
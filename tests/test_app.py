@@ -0,0 +1,325 @@
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+from src.app import (
+    PositionTable,
+    condense_diff,
+    is_trivial_diff,
+    map_ai_response_to_github_format,
+    parse_diff_to_positions,
+)
+
+SAMPLE_DIFF = (Path(__file__).parent / "fixtures" / "sample_pr.diff").read_text()
+
+# The ---/+++ file headers before the first hunk land on line 0, exactly as
+# in the original line-by-line parser; no finding ever points at line 0.
+SAMPLE_POSITIONS = {
+    "src/app.py": {0: 2, 10: 1, 11: 2, 12: 3, 13: 4, 14: 5, 15: 6},
+    "src/api.py": {0: 2, 20: 1, 21: 2, 22: 3, 23: 4, 24: 5},
+}
+
+
+def as_dicts(positions_map):
+    return {path: dict(table) for path, table in positions_map.items()}
+
+
+def test_parse_sample_diff():
+    assert as_dicts(parse_diff_to_positions(SAMPLE_DIFF)) == SAMPLE_POSITIONS
+
+
+def test_removed_lines_take_positions_but_no_line_numbers():
+    diff = (
+        "diff --git a/f.py b/f.py\n"
+        "@@ -1,4 +1,3 @@\n"
+        " a\n"
+        "-b\n"
+        "-c\n"
+        "+d\n"
+        " e\n"
+        "@@ -40,2 +39,2 @@ def g():\n"
+        "-x\n"
+        "+y\n"
+        " z\n"
+    )
+    assert as_dicts(parse_diff_to_positions(diff)) == {
+        "f.py": {1: 1, 2: 4, 3: 5, 39: 2, 40: 3},
+    }
+
+
+def test_lines_outside_hunks_are_ignored():
+    diff = (
+        "From 1234 Mon Sep 17 00:00:00 2001\n"
+        "+not part of any file\n"
+        "diff --git a/f.py b/f.py\n"
+        "@@ -1 +1 @@\n"
+        "+a\n"
+        "\\ No newline at end of file\n"
+    )
+    assert as_dicts(parse_diff_to_positions(diff)) == {"f.py": {1: 1}}
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 4096])
+def test_parse_chunked_matches_whole(size):
+    assert as_dicts(parse_diff_to_positions(chunked(SAMPLE_DIFF, size))) == SAMPLE_POSITIONS
+
+
+def test_parse_random_chunk_boundaries():
+    rng = random.Random(0)
+    diff = SAMPLE_DIFF * 20
+    expected = as_dicts(parse_diff_to_positions(diff))
+
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(diff)), 10))
+        chunks = [diff[a:b] for a, b in zip([0] + cuts, cuts + [len(diff)])]
+        assert as_dicts(parse_diff_to_positions(iter(chunks))) == expected
+
+
+def test_parse_chunks_without_trailing_newline():
+    diff = "diff --git a/f.py b/f.py\n@@ -1 +1,2 @@\n+a\n+b"
+    assert as_dicts(parse_diff_to_positions(["diff --git a/f.py", diff[17:]])) == {
+        "f.py": {1: 1, 2: 2},
+    }
+
+
+def test_position_table_lookups_across_gaps():
+    table = PositionTable([(10, 1, 3), (20, 8, 2)])
+
+    assert dict(table) == {10: 1, 11: 2, 12: 3, 20: 8, 21: 9}
+    assert len(table) == 5
+    assert table[12] == 3
+    assert table.get(13) is None
+    assert table.get(9) is None
+    assert table.get(22) is None
+    assert 21 in table and 15 not in table
+    with pytest.raises(KeyError):
+        table[15]
+
+
+def test_position_table_get_accepts_integral_floats_only():
+    table = PositionTable([(10, 1, 2)])
+
+    assert table.get(11.0) == 2
+    assert table.get(10.5) is None
+    assert table.get("10") is None
+    assert table.get(None, -1) == -1
+
+
+def test_position_table_merges_contiguous_runs():
+    table = PositionTable()
+    table.add_run(1, 1, 2)
+    table.add_run(3, 3, 4)  # continues both line and position
+    table.add_run(7, 9, 1)  # next line, but removed lines sit in between
+    table.add_run(8, 10, 0)  # empty runs are ignored
+
+    assert list(table._lengths) == [6, 1]
+    assert dict(table) == {1: 1, 2: 2, 3: 3, 4: 4, 5: 5, 6: 6, 7: 9}
+
+
+def test_position_table_rebuilds_on_out_of_order_runs():
+    table = PositionTable()
+    table.add_run(10, 1, 3)
+    table.add_run(1, 5, 2)  # before the existing run
+    table.add_run(11, 20, 1)  # overlaps it; later runs win
+
+    assert dict(table) == {1: 5, 2: 6, 10: 1, 11: 20, 12: 3}
+    assert list(table) == sorted(table)
+    assert table.get(2) == 6 and table.get(11) == 20
+
+
+HUNK_HEADER_RE = re.compile(r"@@ -(\d+),(\d+) \+(\d+),(\d+) @@(.*)")
+
+
+def new_file_lines(diff):
+    """{new line number: text} for every +/context line, from the hunk headers."""
+    lines = {}
+    new_line = None
+    for line in diff.splitlines():
+        header = HUNK_HEADER_RE.match(line)
+        if header:
+            new_line = int(header.group(3))
+        elif new_line is not None and line[:1] in ("+", " "):
+            lines[new_line] = line[1:]
+            new_line += 1
+    return lines
+
+
+def check_hunk_counts(diff):
+    lines = diff.splitlines()
+    for i, line in enumerate(lines):
+        header = HUNK_HEADER_RE.match(line)
+        if not header:
+            continue
+        body = []
+        for following in lines[i + 1:]:
+            if following[:1] not in ("+", "-", " ", "\\"):
+                break
+            body.append(following)
+        assert int(header.group(2)) == sum(1 for b in body if b[:1] in ("-", " ")), line
+        assert int(header.group(4)) == sum(1 for b in body if b[:1] in ("+", " ")), line
+
+
+def make_hunk(old_start, new_start, body, suffix=" def handler():"):
+    old_count = sum(1 for line in body if line[:1] in ("-", " "))
+    new_count = sum(1 for line in body if line[:1] in ("+", " "))
+    return (
+        "diff --git a/f.py b/f.py\n--- a/f.py\n+++ b/f.py\n"
+        f"@@ -{old_start},{old_count} +{new_start},{new_count} @@{suffix}\n"
+        + "".join(line + "\n" for line in body)
+    )
+
+
+def test_condense_diff_trims_context_and_keeps_line_numbers():
+    body = [f" ctx{i}" for i in range(10)] + ["-old", "+new", "+extra"] + [f" tail{i}" for i in range(10)]
+    diff = make_hunk(20, 20, body)
+
+    condensed = condense_diff(diff, context=2)
+
+    assert "@@ -28,5 +28,6 @@ def handler():\n ctx8\n ctx9\n-old\n+new\n+extra\n tail0\n tail1\n" in condensed
+    assert "… 8 lines unchanged …\n" in condensed
+    check_hunk_counts(condensed)
+    original = new_file_lines(diff)
+    for number, text in new_file_lines(condensed).items():
+        assert original[number] == text
+
+
+def test_condense_diff_splits_distant_changes_into_hunks():
+    body = ["+top"] + [f" mid{i}" for i in range(20)] + ["-gone"]
+    diff = make_hunk(1, 1, body)
+
+    condensed = condense_diff(diff, context=3)
+
+    headers = [line for line in condensed.splitlines() if line.startswith("@@")]
+    assert headers == ["@@ -1,3 +1,4 @@ def handler():", "@@ -18,4 +19,3 @@"]
+    check_hunk_counts(condensed)
+
+
+def test_condense_diff_random_hunks():
+    rng = random.Random(1)
+    for _ in range(200):
+        body = [rng.choice(" +-") + f"l{i}" for i in range(rng.randint(1, 60))]
+        body = [line if line[0] != " " or rng.random() < 0.8 else "+" + line[1:] for line in body]
+        diff = make_hunk(rng.randint(1, 50), rng.randint(1, 50), body)
+
+        condensed = condense_diff(diff, context=rng.randint(0, 4))
+
+        check_hunk_counts(condensed)
+        assert all(int(n) >= 3 for n in re.findall(r"… (\d+) lines unchanged …", condensed))
+        headers = [line for line in condensed.splitlines() if line.startswith("@@")]
+        if not headers:  # context-only hunk, nothing to keep
+            continue
+        assert headers[0].endswith("@@ def handler():")
+        assert not any(header.endswith("handler():") for header in headers[1:])
+        original = new_file_lines(diff)
+        for number, text in new_file_lines(condensed).items():
+            assert original[number] == text
+
+
+def test_condense_diff_keeps_short_gaps_inline():
+    body = [" a", " b", "+c", " d", " e", " f", " g", "+h", " i", " j", " k", " l", " m"]
+    diff = make_hunk(1, 1, body)
+
+    condensed = condense_diff(diff, context=1)
+
+    # "a" (1 line) and "e", "f" (2 lines) stay inline; "j".."m" (4 lines) collapse
+    assert "@@ -1,7 +1,9 @@ def handler():\n a\n b\n+c\n d\n e\n f\n g\n+h\n i\n" in condensed
+    assert condensed.endswith(" i\n… 4 lines unchanged …\n")
+    assert condensed.count("lines unchanged") == 1
+    check_hunk_counts(condensed)
+
+
+def test_condense_diff_leaves_small_hunks_and_truncates_large_files():
+    diff = make_hunk(1, 1, [" a", "+b", " c"])
+    assert condense_diff(diff) == diff
+
+    big = make_hunk(1, 1, [f"+line {i}" for i in range(100)])
+    condensed = condense_diff(big, max_file_chars=200)
+    assert condensed.endswith("… file truncated …\n")
+    assert len(condensed) <= 200 + len("… file truncated …\n")
+
+
+SAMPLE_TABLES = parse_diff_to_positions(SAMPLE_DIFF)
+
+
+def test_map_findings_to_review_comments():
+    findings = [
+        {"file_path": "src/app.py", "line_number": 13, "severity": "high", "comment": "Validate first."},
+        {"file_path": "src/api.py", "line_number": 23.0, "severity": "medium", "comment": "Use logging."},
+        {"file_path": "src/api.py", "line_number": 99, "severity": "low", "comment": "Not in the diff."},
+        {"file_path": "docs/x.md", "line_number": 1, "severity": "low", "comment": "Unknown file."},
+    ]
+
+    assert map_ai_response_to_github_format(findings, SAMPLE_TABLES) == [
+        {"path": "src/app.py", "position": 4, "body": "**[HIGH]** Validate first."},
+        {"path": "src/api.py", "position": 4, "body": "**[MEDIUM]** Use logging."},
+    ]
+
+
+def test_map_findings_dedups_and_tolerates_unhashable_values():
+    finding = {"file_path": "src/app.py", "line_number": 13, "severity": "high", "comment": "Same."}
+    findings = [
+        finding,
+        dict(finding),
+        {"file_path": ["src/app.py"], "line_number": 13, "severity": "high", "comment": "Bad path."},
+        {"file_path": "src/app.py", "line_number": [13], "severity": "high", "comment": "Bad line."},
+        {"file_path": "src/app.py", "line_number": {"n": 13}, "severity": "high", "comment": "Bad line."},
+    ]
+
+    assert map_ai_response_to_github_format(findings, SAMPLE_TABLES) == [
+        {"path": "src/app.py", "position": 4, "body": "**[HIGH]** Same."},
+    ]
+
+
+def test_map_findings_formats_non_string_fields():
+    findings = [
+        {"file_path": "src/app.py", "line_number": 10, "severity": "high", "comment": None},
+        {"file_path": "src/app.py", "line_number": 11, "severity": "high", "comment": ["a", "b"]},
+        {"file_path": "src/app.py", "line_number": 12, "severity": "Blocker", "comment": "Custom."},
+        {"file_path": "src/app.py", "line_number": 13, "severity": 2, "comment": "Numeric."},
+        {"file_path": "src/app.py", "line_number": 14, "comment": "Default."},
+    ]
+
+    assert [c["body"] for c in map_ai_response_to_github_format(findings, SAMPLE_TABLES)] == [
+        "**[HIGH]** None",
+        "**[HIGH]** ['a', 'b']",
+        "**[BLOCKER]** Custom.",
+        "**[2]** Numeric.",
+        "**[INFO]** Default.",
+    ]
+
+
+LOCKFILE_DIFF = (
+    "diff --git a/web/package-lock.json b/web/package-lock.json\n"
+    "--- a/web/package-lock.json\n+++ b/web/package-lock.json\n"
+    "@@ -1,3 +1,3 @@\n {\n-  \"version\": \"1.0.0\",\n+  \"version\": \"1.0.1\",\n"
+)
+WHITESPACE_DIFF = (
+    "diff --git a/f.py b/f.py\n--- a/f.py\n+++ b/f.py\n"
+    "@@ -1,3 +1,3 @@\n x = 1\n-   \n+\n y = 2\n"
+)
+BINARY_DIFF = (
+    "diff --git a/logo.png b/logo.png\nnew file mode 100644\n"
+    "index 0000000..1234567\nBinary files /dev/null and b/logo.png differ\n"
+)
+MODE_DIFF = "diff --git a/deploy.sh b/deploy.sh\nold mode 100644\nnew mode 100755\n"
+
+
+@pytest.mark.parametrize("diff, trivial", [
+    ("", True),
+    (LOCKFILE_DIFF, True),
+    (WHITESPACE_DIFF, True),
+    (LOCKFILE_DIFF + WHITESPACE_DIFF, True),
+    (SAMPLE_DIFF, False),
+    (LOCKFILE_DIFF + SAMPLE_DIFF, False),
+    (BINARY_DIFF, False),
+    (MODE_DIFF, False),
+    (LOCKFILE_DIFF + MODE_DIFF, False),
+])
+def test_is_trivial_diff(diff, trivial):
+    assert is_trivial_diff(diff) is trivial
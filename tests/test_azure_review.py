@@ -0,0 +1,63 @@
+import pytest
+
+from src.app import parse_diff_to_positions
+
+
+def file_diff(name, size=10):
+    return f"diff --git a/{name} b/{name}\n@@ -1 +1 @@\n-x\n+{'y' * size}\n"
+
+
+def test_review_pr_diff_reviews_each_chunk(azure_review, monkeypatch):
+    monkeypatch.setattr(azure_review, "REVIEW_CHUNK_CHARS", 1)
+    reviewed = []
+
+    def review_chunk(chunk, *_):
+        reviewed.append(chunk)
+        return [{"file_path": chunk.split(" b/")[1].split("\n")[0], "line_number": 1}]
+
+    monkeypatch.setattr(azure_review, "_review_chunk", review_chunk)
+
+    findings = azure_review.review_pr_diff(file_diff("a.py") + file_diff("b.py"))
+
+    assert len(reviewed) == 2
+    assert sorted(f["file_path"] for f in findings) == ["a.py", "b.py"]
+
+
+def test_review_pr_diff_raises_when_a_chunk_fails(azure_review, monkeypatch):
+    monkeypatch.setattr(azure_review, "REVIEW_CHUNK_CHARS", 1)
+
+    def review_chunk(chunk, *_):
+        if "b.py" in chunk:
+            raise RuntimeError("429 Too Many Requests")
+        return [{"file_path": "a.py", "line_number": 1}]
+
+    monkeypatch.setattr(azure_review, "_review_chunk", review_chunk)
+
+    with pytest.raises(RuntimeError, match="1 of 2 diff chunks"):
+        azure_review.review_pr_diff(file_diff("a.py") + file_diff("b.py"))
+
+
+def test_chunk_file_diffs_packs_whole_files(azure_review):
+    files = ["a" * 4, "b" * 4, "c" * 10, "d" * 2]
+
+    assert azure_review._chunk_file_diffs(files, 8) == ["aaaabbbb", "c" * 10, "dd"]
+
+
+def test_prompt_example_follows_its_own_line_rules(azure_review):
+    prompt = azure_review.REVIEW_SYSTEM_PROMPT
+    excerpt = prompt.split("Diff excerpt:\n", 1)[1].split("\n\nExpected output:", 1)[0] + "\n"
+    header, body = excerpt.split("\n", 2)[1:]
+    body_lines = body.splitlines()
+
+    assert header.startswith("@@ -20,%d +20,%d @@" % (
+        sum(1 for line in body_lines if line[:1] in ("-", " ")),
+        sum(1 for line in body_lines if line[:1] in ("+", " ")),
+    ))
+    assert all(line[:1] in ("+", "-", " ") for line in body_lines)
+
+    positions = parse_diff_to_positions(excerpt)["src/api.py"]
+    new_lines = [line for line in body_lines if line[:1] in ("+", " ")]
+    for number in (23, 24):
+        assert new_lines[number - 20].startswith("+")
+        assert number in positions
+        assert f'"line_number":{number}' in prompt
@@ -0,0 +1,76 @@
+import orjson
+import pytest
+
+from src import github_actions
+from src.app import parse_diff_to_positions
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+
+class FakeSession:
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        self.posts.append((url, orjson.loads(data)))
+        return FakeResponse()
+
+
+@pytest.fixture
+def session(monkeypatch):
+    fake = FakeSession()
+    monkeypatch.setattr(github_actions, "get_github_token", lambda: "token")
+    monkeypatch.setattr(github_actions, "http_session", fake)
+    return fake
+
+
+def findings_for(count):
+    return [
+        {"file_path": "big.py", "line_number": i + 1, "severity": "low", "comment": f"Finding {i}"}
+        for i in range(count)
+    ]
+
+
+def big_diff(lines):
+    return "diff --git a/big.py b/big.py\n@@ -0,0 +1,%d @@\n" % lines + "+x\n" * lines
+
+
+@pytest.mark.parametrize("count, sizes", [
+    (1, [1]),
+    (50, [50]),
+    (51, [50, 1]),
+    (120, [50, 50, 20]),
+])
+def test_post_bulk_review_splits_comments_into_reviews(session, count, sizes):
+    positions_map = parse_diff_to_positions(big_diff(200))
+
+    github_actions.post_bulk_review("o/r", 7, findings_for(count), positions_map, head_sha="abc123")
+
+    assert [len(payload["comments"]) for _, payload in session.posts] == sizes
+    assert all(url.endswith("/repos/o/r/pulls/7/reviews") for url, _ in session.posts)
+    assert all(payload["commit_id"] == "abc123" for _, payload in session.posts)
+
+    bodies = [payload["body"] for _, payload in session.posts]
+    assert bodies[0].startswith("## PRGuardian AI Review\n")
+    assert bodies[1:] == [
+        f"## PRGuardian AI Review (continued, part {i}/{len(sizes)})" for i in range(2, len(sizes) + 1)
+    ]
+
+    positions = [c["position"] for _, payload in session.posts for c in payload["comments"]]
+    assert positions == list(range(1, count + 1))
+
+
+def test_post_bulk_review_parses_a_given_diff(session):
+    github_actions.post_bulk_review("o/r", 7, findings_for(3), diff_text=big_diff(2), head_sha="abc123")
+
+    # Line 3 is outside the diff and is dropped while mapping
+    assert [len(payload["comments"]) for _, payload in session.posts] == [2]
+
+
+def test_post_bulk_review_skips_post_without_comments(session):
+    github_actions.post_bulk_review("o/r", 7, [], parse_diff_to_positions(big_diff(2)), head_sha="abc123")
+
+    assert session.posts == []
@@ -0,0 +1,28 @@
+import threading
+import time
+
+
+def test_run_pr_audits_bounds_concurrency_and_keeps_order(integration, monkeypatch):
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def workflow(repo_full_name, pr_number):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        if pr_number == 3:
+            raise RuntimeError("boom")
+        return pr_number
+
+    monkeypatch.setattr(integration, "run_pr_guardian_workflow", workflow)
+
+    results = integration.run_pr_audits("o/r", range(1, 9), max_concurrency=2)
+
+    # A failed audit is reported as False without stopping the others
+    assert results == [1, 2, False, 4, 5, 6, 7, 8]
+    assert peak == 2
@@ -0,0 +1,139 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from src import response_cache as response_cache_module
+from src.response_cache import ResponseCache, normalize_diff
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(response_cache_module.time, "time", fake)
+    return fake
+
+
+def test_exact_hit_and_miss(clock):
+    cache = ResponseCache(ttl_seconds=60)
+    key = ResponseCache.make_key("model", "prompt")
+
+    assert cache.get(key) is None
+    cache.set(key, '{"findings":[]}')
+    assert cache.get(key) == '{"findings":[]}'
+    assert cache.get(ResponseCache.make_key("model", "other")) is None
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = ResponseCache(ttl_seconds=60)
+    cache.set("k", "completion")
+
+    clock.now += 59
+    assert cache.get("k") == "completion"
+    clock.now += 2
+    assert cache.get("k") is None
+
+
+def test_max_entries_evicts_oldest(clock):
+    cache = ResponseCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "b"
+    assert cache.get("c") == "c"
+
+
+def test_semantic_hit_reuses_similar_entry(clock):
+    vectors = {"diff one": [1.0, 0.0], "diff one again": [0.99, 0.01], "unrelated": [0.0, 1.0]}
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return vectors[text]
+
+    cache = ResponseCache(embed=embed, score_threshold=0.95)
+
+    assert cache.get("k1", text="diff one") is None
+    cache.set("k1", "first", text="diff one")
+    # The vector from the missed get() is reused by set()
+    assert calls == ["diff one"]
+
+    assert cache.get("k2", text="diff one again") == "first"
+    assert cache.get("k3", text="unrelated") is None
+
+
+def test_semantic_hit_stays_within_namespace(clock):
+    cache = ResponseCache(embed=lambda text: [1.0, 0.0], score_threshold=0.95)
+    cache.set("k1", "for model a", text="diff", namespace="model-a")
+
+    assert cache.get("k2", text="diff", namespace="model-b") is None
+    assert cache.get("k3", text="diff", namespace="model-a") == "for model a"
+
+
+def test_missing_redis_package_falls_back_to_memory(clock, monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)  # makes "import redis" fail
+
+    cache = ResponseCache(redis_url="redis://localhost:6379/0")
+    cache.set("k", "completion")
+
+    assert cache.get("k") == "completion"
+
+
+def test_normalize_diff_ignores_blob_shas_and_crlf():
+    a = "diff --git a/x b/x\nindex 1111111..2222222 100644\n--- a/x\n+++ b/x\n+y\n"
+    b = "diff --git a/x b/x\r\nindex 3333333..4444444 100644\r\n--- a/x\r\n+++ b/x\r\n+y\r\n"
+    assert normalize_diff(a) == normalize_diff(b)
+
+
+def test_review_chunk_only_caches_fresh_completions(azure_review, monkeypatch):
+    embedded = []
+    cache = ResponseCache(embed=lambda text: embedded.append(text) or [1.0])
+    monkeypatch.setattr(azure_review, "response_cache", cache)
+
+    stored = []
+    original_set = cache.set
+    monkeypatch.setattr(cache, "set", lambda *a, **kw: stored.append(a) or original_set(*a, **kw))
+
+    completions = []
+
+    def create(**kwargs):
+        completions.append(kwargs)
+        message = SimpleNamespace(content='{"findings":[]}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    monkeypatch.setattr(azure_review.client.chat.completions, "create", create)
+
+    for _ in range(3):
+        assert azure_review._review_chunk("diff --git a/x b/x\n+y\n", "", "model") == []
+
+    assert len(completions) == 1
+    assert len(stored) == 1
+    assert len(embedded) == 1
+
+
+def test_review_chunk_semantic_hits_need_matching_policies(azure_review, monkeypatch):
+    cache = ResponseCache(embed=lambda text: [1.0])
+    monkeypatch.setattr(azure_review, "response_cache", cache)
+    completions = []
+
+    def create(**kwargs):
+        completions.append(kwargs)
+        message = SimpleNamespace(content='{"findings":[]}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    monkeypatch.setattr(azure_review.client.chat.completions, "create", create)
+
+    azure_review._review_chunk("diff --git a/x b/x\n+y\n", "Policy Snippet 1:\nA", "model")
+    azure_review._review_chunk("diff --git a/x b/x\n+z\n", "Policy Snippet 1:\nB", "model")
+    azure_review._review_chunk("diff --git a/x b/x\n+w\n", "Policy Snippet 1:\nA", "model")
+
+    assert len(completions) == 2